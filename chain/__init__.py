@@ -0,0 +1,87 @@
+""" Wrapper module around the Solana JSON RPC API """
+
+from subprocess import run
+from typing import Optional
+
+from pydantic import BaseModel, NonNegativeInt
+
+SOLANA_RPC = {
+    "mainnet-beta": "https://api.mainnet-beta.solana.com",
+    "mainnet": "https://api.mainnet-beta.solana.com",
+    "testnet": "https://api.testnet.solana.com",
+    "devnet": "https://api.devnet.solana.com",
+    # The default RPC URL exposed by 'solana-test-validator'
+    "localnet": "http://127.0.0.1:8899",
+}
+# The genesis hash of each public cluster, used to check that the RPC endpoints belong to it
+GENESIS_HASH = {
+    "mainnet-beta": "5eykt4UsFv8P8NJdTREpY1vzqKqZKvdpKuc147dw2N9d",
+    "mainnet": "5eykt4UsFv8P8NJdTREpY1vzqKqZKvdpKuc147dw2N9d",
+    "testnet": "4uhcVJyU9pJkvQyS88uRDiswHXSCkY3zQawwpjk2NsNY",
+    "devnet": "EtWTRABZaYq6iMfeYKouRu166VU2xqa1wcaWoxPkrZBG",
+}
+
+# The SPL Token program, owner of every token account
+TOKEN_PROGRAM_ID = "TokenkegQfeZyiNwAJbNbGKPFXCWuBvf9Ss623VQ5DA"
+# The Metaplex Token Metadata program, owner of every metadata account
+METADATA_PROGRAM_ID = "metaqbxxUerdq28cj1RbAWkYQm3ybzjb6a8bt518x1s"
+# The maximum number of accounts that can be requested with a single 'getMultipleAccounts' call
+MAX_MULTIPLE_ACCOUNTS = 100
+
+
+def get_rpc_url(env: str = "devnet") -> str:
+    """ Returns the RPC URL for the given cluster name, custom URLs are returned as they are """
+    if env.startswith(("http://", "https://")):
+        return env
+
+    rpc_url = SOLANA_RPC.get(env, None)
+    if rpc_url is None or not rpc_url:
+        raise ValueError(f"env argument: '{env}' is not supported")
+
+    return rpc_url
+
+
+def get_cli_rpc_url() -> str:
+    """ Returns the RPC URL set in the Solana CLI configuration ('solana config get') """
+    status = run(["solana", "config", "get", "json_rpc_url"], check=False, capture_output=True, text=True)
+    assert status.returncode == 0, "'solana config get' command execution failed"
+
+    # The output format is "RPC URL: https://api.devnet.solana.com"
+    return status.stdout.split(":", 1)[1].strip()
+
+
+class TokenAccount(BaseModel):
+    """Validator class to type annotate the SPL token accounts returned by 'getTokenAccountsByOwner'"""
+    address: str
+    mint: str
+    owner: str
+    amount: NonNegativeInt
+    decimals: NonNegativeInt
+
+
+class MetadataCreator(BaseModel):
+    """Validator class to type annotate a creator entry of an on-chain metadata account"""
+    address: str
+    verified: bool
+    share: NonNegativeInt
+
+
+class MetadataCollection(BaseModel):
+    """Validator class to type annotate the collection entry of an on-chain metadata account"""
+    key: str
+    verified: bool
+
+
+class MetadataAccount(BaseModel):
+    """Validator class to type annotate a decoded Metaplex metadata account"""
+    address: str
+    mint: str
+    update_authority: str
+
+    name: str
+    symbol: str
+    uri: str
+
+    seller_fee_basis_points: NonNegativeInt
+    creators: list[MetadataCreator] = []
+    collection: Optional[MetadataCollection] = None
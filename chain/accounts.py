@@ -0,0 +1,43 @@
+""" Wrapper module around the Solana JSON RPC API """
+
+from base64 import b64decode
+from typing import Optional
+
+from chain import MAX_MULTIPLE_ACCOUNTS, TOKEN_PROGRAM_ID, TokenAccount
+from chain.rpc import call
+
+
+def get_token_accounts_by_owner(wallet: str, env: str = "devnet", mint: Optional[str] = None) -> list[TokenAccount]:
+    """ Get the SPL token accounts owned by the given Solana wallet (optionally only for the given mint) """
+    # Asks for the JSON parsed encoding so that the token account data doesn't need decoding
+    account_filter = {"mint": mint} if mint is not None else {"programId": TOKEN_PROGRAM_ID}
+    params = [wallet, account_filter, {"encoding": "jsonParsed"}]
+    results = call("getTokenAccountsByOwner", params, env)
+
+    accounts = []
+    for item in results["value"]:
+        info = item["account"]["data"]["parsed"]["info"]
+        accounts.append(
+            TokenAccount(
+                address=item["pubkey"],
+                mint=info["mint"],
+                owner=info["owner"],
+                amount=int(info["tokenAmount"]["amount"]),
+                decimals=info["tokenAmount"]["decimals"],
+            ))
+
+    return accounts
+
+
+def get_multiple_accounts(addresses: list[str], env: str = "devnet") -> dict[str, Optional[bytes]]:
+    """ Get the raw data of the given accounts, batching the requests in chunks of 100 addresses """
+    accounts: dict[str, Optional[bytes]] = {}
+
+    for start in range(0, len(addresses), MAX_MULTIPLE_ACCOUNTS):
+        chunk = addresses[start:start + MAX_MULTIPLE_ACCOUNTS]
+        results = call("getMultipleAccounts", [chunk, {"encoding": "base64"}], env)
+        # Missing accounts are returned as null, the order matches the requested one
+        for address, account in zip(chunk, results["value"]):
+            accounts[address] = None if account is None else b64decode(account["data"][0])
+
+    return accounts
@@ -0,0 +1,112 @@
+""" Helpers to derive and decode Metaplex metadata accounts """
+
+from hashlib import sha256
+from typing import Optional
+
+from base58 import b58decode, b58encode
+
+from chain import METADATA_PROGRAM_ID, MetadataAccount, MetadataCollection, MetadataCreator
+from chain.accounts import get_multiple_accounts
+
+# Field prime and curve constant of ed25519, used to tell apart PDAs from regular public keys
+ED25519_P = 2**255 - 19
+ED25519_D = (-121665 * pow(121666, ED25519_P - 2, ED25519_P)) % ED25519_P
+
+# Per run cache of the decoded metadata accounts (keyed by cluster and mint address)
+_metadata_cache: dict[tuple[str, str], Optional[MetadataAccount]] = {}
+
+
+def is_on_curve(public_key: bytes) -> bool:
+    """ Checks if the given 32 bytes are a valid (compressed) ed25519 curve point """
+    y = int.from_bytes(public_key, "little") & ((1 << 255) - 1)
+    y2 = y * y % ED25519_P
+    # Recovers x^2 from the curve equation -x^2 + y^2 = 1 + d*x^2*y^2
+    x2 = (y2 - 1) * pow(ED25519_D * y2 + 1, ED25519_P - 2, ED25519_P) % ED25519_P
+    # The point exists only if x^2 is a quadratic residue (Euler's criterion)
+    return x2 == 0 or pow(x2, (ED25519_P - 1) // 2, ED25519_P) == 1
+
+
+def find_program_address(seeds: list[bytes], program_id: str) -> str:
+    """ Derives the program address (PDA) with the highest valid bump for the given seeds """
+    program_bytes = b58decode(program_id)
+
+    for bump in range(255, -1, -1):
+        candidate = sha256(b"".join(seeds) + bytes([bump]) + program_bytes + b"ProgramDerivedAddress").digest()
+        if not is_on_curve(candidate):
+            return b58encode(candidate).decode()
+
+    raise ValueError("Unable to find a viable program address")
+
+
+def get_metadata_address(mint: str) -> str:
+    """ Derives the Metaplex metadata account address for the given mint """
+    seeds = [b"metadata", b58decode(METADATA_PROGRAM_ID), b58decode(mint)]
+    return find_program_address(seeds, METADATA_PROGRAM_ID)
+
+
+def decode_metadata(address: str, data: bytes) -> MetadataAccount:
+    """ Decodes the Borsh serialized data of a Metaplex metadata account """
+    offset = 1  # Skips the account key/discriminator
+
+    def read(size: int) -> bytes:
+        nonlocal offset
+        offset += size
+        return data[offset - size:offset]
+
+    def read_pubkey() -> str:
+        return b58encode(read(32)).decode()
+
+    def read_int(size: int) -> int:
+        return int.from_bytes(read(size), "little")
+
+    def read_str() -> str:
+        # Fixed size strings are padded with null bytes on chain
+        return read(read_int(4)).decode("utf-8", errors="ignore").rstrip("\x00")
+
+    update_authority, mint = read_pubkey(), read_pubkey()
+    name, symbol, uri = read_str(), read_str(), read_str()
+    seller_fee_basis_points = read_int(2)
+
+    creators = []
+    if read_int(1) == 1:
+        for _ in range(read_int(4)):
+            creators.append(MetadataCreator(address=read_pubkey(), verified=read_int(1) == 1, share=read_int(1)))
+
+    # Skips 'primary_sale_happened' and 'is_mutable'
+    read(2)
+    # Skips the optional 'edition_nonce' and 'token_standard' fields
+    for _ in range(2):
+        if read_int(1) == 1:
+            read(1)
+
+    collection = None
+    # Legacy metadata accounts can end before the 'collection' field
+    if offset < len(data) and read_int(1) == 1:
+        verified = read_int(1) == 1
+        collection = MetadataCollection(key=read_pubkey(), verified=verified)
+
+    return MetadataAccount(
+        address=address,
+        mint=mint,
+        update_authority=update_authority,
+        name=name,
+        symbol=symbol,
+        uri=uri,
+        seller_fee_basis_points=seller_fee_basis_points,
+        creators=creators,
+        collection=collection,
+    )
+
+
+def get_metadata_by_mints(mints: list[str], env: str = "devnet") -> dict[str, Optional[MetadataAccount]]:
+    """ Get the metadata accounts for the given mints, fetching only the ones not already cached """
+    missing = [mint for mint in dict.fromkeys(mints) if (env, mint) not in _metadata_cache]
+
+    if missing:
+        addresses = {get_metadata_address(mint): mint for mint in missing}
+        raw_accounts = get_multiple_accounts(list(addresses.keys()), env)
+
+        for address, data in raw_accounts.items():
+            _metadata_cache[(env, addresses[address])] = None if data is None else decode_metadata(address, data)
+
+    return {mint: _metadata_cache[(env, mint)] for mint in mints}
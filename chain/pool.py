@@ -0,0 +1,305 @@
+""" Shared RPC endpoint layer: endpoint pooling, health checks and adaptive rate limiting """
+
+from os import environ
+from re import IGNORECASE
+from re import compile as regex
+from shlex import quote
+from subprocess import PIPE, STDOUT, CompletedProcess, Popen
+from sys import stdout
+from threading import Lock
+from time import monotonic, sleep
+from typing import Any, Iterable, Optional, Union
+
+from requests import RequestException, post
+
+from chain import GENESIS_HASH, get_rpc_url
+
+# Environment variable with the default endpoints list (comma separated, 'url@weight' to set a weight)
+ENDPOINTS_ENV_VAR = "HERBS_RPC_ENDPOINTS"
+# Token bucket refill rates (requests per second) and AIMD adaptation factors
+INITIAL_RATE, MIN_RATE, MAX_RATE = 10.0, 0.5, 40.0
+RATE_INCREASE, RATE_DECREASE, SLOW_DECREASE = 0.5, 0.5, 0.9
+# Latency (in seconds) above which an RPC response counts as a slowdown signal
+LATENCY_TARGET = 2.0
+# Consecutive failures after which an endpoint is considered unhealthy
+MAX_FAILURES = 3
+# Seconds between the health checks of each endpoint, so that an endpoint going down (or falling
+# behind) after the pool is configured is noticed, and an unhealthy one is taken back once it recovers
+HEALTH_CHECK_INTERVAL = 30.0
+# Maximum number of retries for rate limited operations and the base of the exponential backoff
+MAX_RETRIES, BACKOFF_BASE = 5, 0.5
+# Pattern used to detect rate limiting errors in the Solana/Candy Machine CLI tools output, matching
+# the HTTP status text they report, e.g. "HTTP status client error (429 Too Many Requests) for url"
+# (spl-token) or "Server responded with 429 Too Many Requests" (web3.js)
+RATE_LIMITED = regex(r"\b429 Too Many Requests\b", IGNORECASE)
+# Pattern used to detect connection errors in the CLI tools output, e.g. "error sending request for
+# url (...): error trying to connect: tcp connect error: Connection refused (os error 111)" (Solana
+# CLI) or "FetchError: request to ... failed, reason: connect ECONNREFUSED" (web3.js)
+UNREACHABLE = regex(
+    r"\berror sending request\b|\bconnection (refused|reset|timed out)\b"
+    r"|\bE(CONNREFUSED|CONNRESET|TIMEDOUT|NOTFOUND)\b",
+    IGNORECASE,
+)
+
+
+class TokenBucket:
+    """Token bucket rate limiter whose refill rate adapts to 429s and latency (AIMD)"""
+
+    def __init__(self, rate: float = INITIAL_RATE):
+        self.rate = rate
+        self.tokens = 1.0
+        self.updated_at = monotonic()
+        self.lock = Lock()
+
+    def _refill(self) -> None:
+        now = monotonic()
+        # The bucket capacity follows the rate, allowing bursts of up to one second of requests
+        self.tokens = min(max(self.rate, 1.0), self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def acquire(self) -> None:
+        """Blocks until a token is available and consumes it"""
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= 1.0:
+                    self.tokens -= 1.0
+                    return
+                wait = (1.0 - self.tokens) / self.rate
+            sleep(wait)
+
+    def throttle(self) -> None:
+        """Halves the rate and empties the bucket, called when the endpoint answers with a 429"""
+        with self.lock:
+            self._refill()
+            self.rate = max(MIN_RATE, self.rate * RATE_DECREASE)
+            self.tokens = min(self.tokens, 0.0)
+
+    def recover(self, latency: Optional[float] = None) -> None:
+        """Increases the rate (about RATE_INCREASE each second) unless the endpoint is getting slower"""
+        with self.lock:
+            if latency is not None and latency > LATENCY_TARGET:
+                self.rate = max(MIN_RATE, self.rate * SLOW_DECREASE)
+            else:
+                self.rate = min(MAX_RATE, self.rate + RATE_INCREASE / self.rate)
+
+
+class Endpoint:
+    """A single RPC endpoint with its weight, health status and rate limiter"""
+
+    def __init__(self, url: str, weight: int = 1):
+        assert weight > 0, f"Invalid weight {weight} for endpoint {url}"
+        self.url = url
+        self.weight = weight
+        self.bucket = TokenBucket()
+        self.current_weight = 0
+        self.failures = 0
+        self.healthy = True
+        self.checked_at = monotonic()
+        self.verified = False  # Whether the endpoint is known to belong to the pool's cluster
+
+
+def is_healthy(url: str) -> bool:
+    """Checks the endpoint status with the 'getHealth' RPC method"""
+    body = {"jsonrpc": "2.0", "id": 1, "method": "getHealth"}
+    try:
+        return post(url, json=body, timeout=5).json().get("result", None) == "ok"
+    except (RequestException, ValueError):
+        return False
+
+
+def get_genesis_hash(url: str) -> Optional[str]:
+    """Returns the genesis hash of the endpoint's cluster with the 'getGenesisHash' RPC method"""
+    body = {"jsonrpc": "2.0", "id": 1, "method": "getGenesisHash"}
+    try:
+        return post(url, json=body, timeout=5).json().get("result", None)
+    except (RequestException, ValueError):
+        return None
+
+
+class EndpointPool:
+    """A pool of RPC endpoints selected with (smooth) weighted round-robin among the healthy ones"""
+
+    def __init__(self, endpoints: list[Endpoint], genesis_hash: Optional[str] = None):
+        assert len(endpoints) > 0, "At least one RPC endpoint is required"
+        self.endpoints = endpoints
+        self.genesis_hash = genesis_hash  # The genesis hash of the endpoints cluster, if known
+        self.lock = Lock()
+
+    def verify_cluster(self, endpoint: Endpoint) -> bool:
+        """
+        Checks (once) that the endpoint belongs to the pool's cluster, raising a ValueError if it
+        doesn't. Returns False if the genesis hash couldn't be retrieved.
+        """
+        if self.genesis_hash is None or endpoint.verified:
+            return True
+        genesis_hash = get_genesis_hash(endpoint.url)
+        if genesis_hash is None:
+            return False
+        if genesis_hash != self.genesis_hash:
+            raise ValueError(f"RPC endpoint {endpoint.url} doesn't belong to the cluster {self.genesis_hash}")
+        endpoint.verified = True
+        return True
+
+    def check_health(self, due_only: bool = False) -> None:
+        """Health checks the endpoints, with 'due_only' only the ones not checked for HEALTH_CHECK_INTERVAL"""
+        now = monotonic()
+        # The endpoints to check are claimed under the lock, so that concurrent callers don't check them twice
+        with self.lock:
+            due = [e for e in self.endpoints if not due_only or now - e.checked_at >= HEALTH_CHECK_INTERVAL]
+            for endpoint in due:
+                endpoint.checked_at = now
+
+        for endpoint in due:
+            # An endpoint is verified once healthy, so also the ones unreachable at first are checked
+            healthy = is_healthy(endpoint.url) and self.verify_cluster(endpoint)
+            with self.lock:
+                endpoint.healthy, endpoint.failures = healthy, 0 if healthy else endpoint.failures
+
+    def select(self) -> Endpoint:
+        """Returns the next endpoint, if all of them are unhealthy they are all taken into account"""
+        self.check_health(due_only=True)
+
+        with self.lock:
+            candidates = [e for e in self.endpoints if e.healthy] or self.endpoints
+            for endpoint in candidates:
+                endpoint.current_weight += endpoint.weight
+            selected = max(candidates, key=lambda e: e.current_weight)
+            selected.current_weight -= sum(e.weight for e in candidates)
+
+        return selected
+
+    def acquire(self) -> Endpoint:
+        """Selects the next endpoint and waits for its rate limiter"""
+        endpoint = self.select()
+        endpoint.bucket.acquire()
+        return endpoint
+
+    def report(self,
+               endpoint: Endpoint,
+               latency: Optional[float] = None,
+               throttled: bool = False,
+               failed: bool = False) -> None:
+        """Updates the endpoint rate limiter and health status with the outcome of an operation"""
+        if throttled:
+            endpoint.bucket.throttle()
+        elif not failed:
+            endpoint.bucket.recover(latency)
+
+        with self.lock:
+            endpoint.failures = endpoint.failures + 1 if failed else 0
+            if endpoint.failures >= MAX_FAILURES:
+                endpoint.healthy, endpoint.checked_at = False, monotonic()
+
+    def report_cli(self, endpoint: Endpoint, returncode: int, output: str) -> bool:
+        """
+        Reports the outcome of a CLI command from its exit code and output. A command can fail for
+        its own reasons (e.g. a missing account), which say nothing about the endpoint, so only the
+        successful ones increase the rate. Returns whether the command failed because of the endpoint
+        (rate limited or unreachable), in which case it can be retried on another one.
+        """
+        if returncode == 0:
+            self.report(endpoint)
+        elif RATE_LIMITED.search(output) is not None:
+            self.report(endpoint, throttled=True)
+        elif UNREACHABLE.search(output) is not None:
+            self.report(endpoint, failed=True)
+        else:
+            return False
+        return returncode != 0
+
+
+# The pools in use for the current run (keyed by cluster name)
+_pools: dict[str, EndpointPool] = {}
+_pools_lock = Lock()
+
+
+def parse_endpoints(endpoints: Union[str, Iterable[str]]) -> list[Endpoint]:
+    """Parses a list (or comma separated string) of endpoints in the 'url' or 'url@weight' format"""
+    if isinstance(endpoints, str):
+        endpoints = endpoints.split(",")
+
+    parsed = []
+    for item in (e.strip() for e in endpoints if e.strip()):
+        url, _, weight = item.rpartition("@")
+        # The '@' can be part of the URL as well (e.g. credentials), in that case no weight is given
+        parsed.append(Endpoint(url, int(weight)) if url and weight.isdigit() else Endpoint(item))
+
+    return parsed
+
+
+def configure(env: str = "devnet", endpoints: Optional[Union[str, Iterable[str]]] = None) -> EndpointPool:
+    """
+    Sets up the pool used for the given cluster. The endpoints are taken in order from the given
+    argument, the HERBS_RPC_ENDPOINTS environment variable or the cluster's default RPC URL.
+    The endpoints of a public cluster must belong to it (same genesis hash) or a ValueError is
+    raised, so that e.g. a leftover environment variable can't send a run to the wrong cluster.
+    """
+    endpoints = endpoints or environ.get(ENDPOINTS_ENV_VAR, None) or [get_rpc_url(env)]
+    pool = EndpointPool(parse_endpoints(endpoints), GENESIS_HASH.get(env, None))
+    pool.check_health()
+
+    with _pools_lock:
+        _pools[env] = pool
+    return pool
+
+
+def get_pool(env: str = "devnet") -> EndpointPool:
+    """Returns the pool of the given cluster, configuring it with the defaults if needed"""
+    with _pools_lock:
+        pool = _pools.get(env, None)
+    return pool if pool is not None else configure(env)
+
+
+def request(method: str, params: list[Any], env: str = "devnet", retries: int = MAX_RETRIES) -> dict:
+    """
+    Executes a JSON RPC request through the pool, retrying on rate limiting and connection errors.
+    NOTE: Only read methods are sent through here, so the requests are always safe to repeat.
+    """
+    pool, body = get_pool(env), {"jsonrpc": "2.0", "id": 1, "method": method, "params": params}
+
+    for attempt in range(retries + 1):
+        endpoint = pool.acquire()
+        started_at = monotonic()
+        try:
+            response = post(endpoint.url, json=body, timeout=30)
+            throttled = response.status_code == 429
+            if not throttled:
+                response.raise_for_status()
+                pool.report(endpoint, latency=monotonic() - started_at)
+                return response.json()
+            pool.report(endpoint, throttled=True)
+        except RequestException:
+            pool.report(endpoint, failed=True)
+            if attempt == retries:
+                raise
+        if attempt < retries:
+            sleep(BACKOFF_BASE * 2**attempt)
+
+    raise RuntimeError(f"RPC method '{method}' still rate limited after {retries} retries")
+
+
+def run_cli(cmd: str, env: str = "devnet", url_flag: str = "--url", retries: int = 0) -> CompletedProcess:
+    """
+    Runs a CLI command (spl-token, Candy Machine, ...) against an endpoint of the pool, the
+    output is forwarded to stdout and scanned for rate limiting and connection errors to adapt the
+    rate limiter and the endpoint health status.
+    NOTE: A rate limited transaction may have landed anyway (e.g. the 429 is received while
+    confirming it), so commands are retried with backoff only if they opt in with 'retries',
+    which must be done only for read-only or idempotent commands.
+    """
+    pool = get_pool(env)
+
+    for attempt in range(retries + 1):
+        endpoint = pool.acquire()
+        output = []
+        url_cmd = f"{cmd} {url_flag} {quote(endpoint.url)}"
+        with Popen(url_cmd, shell=True, stdout=PIPE, stderr=STDOUT, text=True) as process:
+            for line in process.stdout:
+                stdout.write(line)
+                output.append(line)
+
+        retryable = pool.report_cli(endpoint, process.returncode, "".join(output))
+        if not retryable or attempt == retries:
+            return CompletedProcess(cmd, process.returncode, "".join(output))
+        sleep(BACKOFF_BASE * 2**attempt)
@@ -0,0 +1,16 @@
+""" Wrapper module around the Solana JSON RPC API """
+
+from typing import Any
+
+from chain.pool import request
+
+
+def call(method: str, params: list[Any], env: str = "devnet") -> Any:
+    """ Executes a JSON RPC request against the given cluster and returns its 'result' field """
+    # Makes the request through the shared endpoint pool and parses the body response to JSON
+    response = request(method, params, env)
+
+    if "error" in response:
+        raise RuntimeError(f"RPC method '{method}' failed: {response['error'].get('message', '')}")
+
+    return response["result"]
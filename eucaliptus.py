@@ -6,33 +6,73 @@ The only required CLI argument is the path to a .csv files that contains the wal
 of token to be transferred and the collectionId/programId to retrieve all the tokens associated
 to the Candy Machine.
 
+The owned tokens are retrieved by default through Rarible's indexer, passing '--source=rpc' they
+are instead resolved directly from the Solana RPC (token accounts and Metaplex metadata accounts).
+
+All the on-chain operations go through the shared RPC endpoint pool, a comma separated list of
+endpoints (optionally weighted as 'url@weight') can be provided with '--endpoints' or with the
+HERBS_RPC_ENDPOINTS environment variable, otherwise the default RPC URL of the cluster is used.
+
+Passing '--plan=plan.json' nothing is transferred, the token -> recipient assignment is saved to
+the given file together with the estimated transactions, fees, rent and duration of the run.
+The saved plan can then be executed exactly with '--from_plan=plan.json'.
+
+The tokens are assigned to the recipients with a seeded (--seed) and reproducible strategy:
+'random' (default), 'rarity' to spread the trait rarity evenly among the recipients or 'exact'
+to transfer only the mint addresses listed in the optional 'ids' column of the .csv file (ids
+are always honored, with the other strategies filling the remaining quantity). Passing
+'--assignment=assignment.json' the mapping is exported, or reused if the file already exists
+(only with the same wallet, collection, env, strategy and seed) so that an interrupted run can
+be resumed skipping the tokens already transferred.
+
 ! NOTE: In order for this script to work the Solana CLI must be installed and the
 ! keypair must be set globally with the following command:
 !     $ solana config set --keypair ~/.config/solana/your_key.json
 
 Example:
     $ python3 eucaliptus.py --collectionId="8gex...i895fei4" --csv=../mock.csv
+    $ python3 eucaliptus.py --collectionId="8gex...i895fei4" --csv=../mock.csv --source=rpc
+    $ python3 eucaliptus.py --collectionId="8gex...i895fei4" --csv=../mock.csv --endpoints="https://a@3,https://b"
+    $ python3 eucaliptus.py --collectionId="8gex...i895fei4" --csv=../mock.csv --plan=plan.json
+    $ python3 eucaliptus.py --collectionId="8gex...i895fei4" --csv=../mock.csv --from_plan=plan.json
+    $ python3 eucaliptus.py --collectionId="8gex...i895fei4" --csv=../mock.csv --strategy=rarity --seed=42
+    $ python3 eucaliptus.py --collectionId="8gex...i895fei4" --csv=../mock.csv --assignment=assignment.json
 """
 
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from csv import DictReader
 from datetime import datetime
 from functools import reduce
 from itertools import repeat
-from os import PathLike, system
+from os import PathLike
 from os.path import abspath, basename, exists, isfile
-from random import choice
+from random import randrange
 from shutil import which
-from typing import List
+from time import monotonic
+from typing import List, Optional, Union
 
 from fire import Fire
-from pydantic import BaseModel, PositiveInt
+from pydantic import BaseModel, PositiveInt, validator
+from requests import RequestException
+from requests import get as get_json
 from rich.console import Console
 
+from planner import Operation, describe_plan, load_plan, make_plan
+from planner.assignment import (Allocation, Strategy, Traits, assign, load_assignment,
+                                save_assignment)
+from planner.costs import LATENCY_MESSAGES
 from rarible import RaribleNFT
 from rarible.items import get_by_owner
+from chain import MetadataAccount
+from chain.accounts import get_token_accounts_by_owner
+from chain.metadata import get_metadata_by_mints
+from chain.pool import configure, run_cli
 
 # The bash command format to be used in order to transfer SPL Tokens
 TRANSFER_CMD = "spl-token transfer {token_addr} 1 {dest_addr} --allow-unfunded-recipient --fund-recipient"
+# The number of concurrent requests used to fetch the off-chain JSON metadata
+METADATA_WORKERS = 16
 # A shared/sharable console object to pretty print strings
 console = Console(record=True)
 
@@ -41,6 +81,12 @@ class CsvRow(BaseModel):
     """The format required for the input .csv row"""
     address: str
     quantity: PositiveInt
+    ids: list[str] = []  # Optional column with the exact tokens (mint addresses) to be transferred
+
+    @validator('ids', pre=True)
+    def split_ids(cls, value: Union[str, list[str], None]):
+        """Splits the 'ids' column, the mint addresses are separated by spaces or semicolons"""
+        return value.replace(";", " ").split() if isinstance(value, str) else value or []
 
 
 def get_owned_by_collection(wallet: str, collection_id: str, env: str = "devnet") -> List[RaribleNFT]:
@@ -58,6 +104,32 @@ def get_owned_by_collection(wallet: str, collection_id: str, env: str = "devnet"
     return filtered_nfts
 
 
+def get_owned_on_chain(wallet: str, collection_id: str, env: str = "devnet") -> List[str]:
+    """Returns the mint addresses of the NFTs from the given collection owned by the given wallet"""
+    # Gets all the token accounts of the wallet, keeping only the NFTs (single token, no decimals)
+    token_accounts = get_token_accounts_by_owner(wallet, env)
+    owned_mints = [acc.mint for acc in token_accounts if acc.amount == 1 and acc.decimals == 0]
+
+    # Resolves the metadata accounts (in batches) to check the collection membership, a token
+    # belongs to the collection if it's its verified collection or verified Candy Machine creator
+    def in_collection(metadata: Optional[MetadataAccount]) -> bool:
+        if metadata is None:
+            return False
+        if metadata.collection is not None and metadata.collection.verified:
+            return metadata.collection.key == collection_id
+        return any(c.address == collection_id for c in metadata.creators if c.verified)
+
+    metadata_by_mint = get_metadata_by_mints(owned_mints, env)
+    filtered_mints = [mint for mint in owned_mints if in_collection(metadata_by_mint[mint])]
+
+    # ! Debug only, will remove later
+    message = f"Owned NFTs from the specified collection (n. {len(filtered_mints)})"
+    console.print(f"[green]\n -> {message}[/green]")
+    [console.print(f"[yellow]\t{x} -> {metadata_by_mint[x].name}[yellow]") for x in filtered_mints]
+
+    return filtered_mints
+
+
 def get_transfers_list(csv_path: PathLike) -> List[CsvRow]:
     """Read the transfer .csv and returns a typed list if the format is correct"""
     # Reads input .csv file and converts it to a typed dataclass
@@ -70,8 +142,88 @@ def get_transfers_list(csv_path: PathLike) -> List[CsvRow]:
     return transfers_todo
 
 
-def main(wallet: str, collection_id: str, csv_path: PathLike, env: str = "devnet") -> None:
-    """Lavender script entrypoint"""
+def get_rarible_traits(nfts: List[RaribleNFT]) -> dict[str, Traits]:
+    """Returns the traits of the given Rarible NFTs, by mint address"""
+    traits = {}
+    for nft in nfts:
+        attributes = nft.meta.attributes if nft.meta else []
+        # The attributes without a value are skipped, they'd all count as the same "None" trait
+        mint = nft.id.split(":").pop()
+        traits[mint] = [(a.key, a.value) for a in attributes if a.value is not None]
+    return traits
+
+
+def get_traits_on_chain(mints: List[str], env: str = "devnet") -> dict[str, Traits]:
+    """Returns the traits of the given NFTs, read from the off-chain JSON metadata of each one"""
+    # The metadata accounts are already cached by the ownership lookup
+    metadata_by_mint = get_metadata_by_mints(mints, env)
+
+    def fetch_traits(mint: str) -> Optional[Traits]:
+        # A single unreachable or malformed metadata must not abort the whole run
+        try:
+            metadata = get_json(metadata_by_mint[mint].uri, timeout=30).json()
+            return [
+                (str(attr.get("trait_type")), str(attr.get("value")))
+                for attr in metadata.get("attributes", [])
+                if isinstance(attr, dict) and attr.get("trait_type") is not None
+                and attr.get("value") is not None
+            ]
+        except (RequestException, ValueError, AttributeError, TypeError):
+            return None
+
+    with ThreadPoolExecutor(max_workers=METADATA_WORKERS) as executor:
+        traits = dict(zip(mints, executor.map(fetch_traits, mints)))
+
+    failed = [mint for mint, mint_traits in traits.items() if mint_traits is None]
+    if failed:
+        message = f"Unable to read the traits of {len(failed)} NFTs, considered without traits"
+        console.print(f"[yellow]{message}[/yellow]")
+
+    return {mint: mint_traits or [] for mint, mint_traits in traits.items()}
+
+
+def is_held_by(wallet: str, mint: str, env: str = "devnet") -> bool:
+    """Checks on chain if the given wallet holds the token of the given mint"""
+    accounts = get_token_accounts_by_owner(wallet, env, mint=mint)
+    return any(account.amount > 0 for account in accounts)
+
+
+def matches_transfers(operations: List[Operation], transfers_list: List[CsvRow]) -> bool:
+    """Checks that the given operations transfer exactly the quantities required by the .csv file"""
+    required = reduce(lambda acc, t: acc + Counter({t.address: int(t.quantity)}),
+                      transfers_list,
+                      Counter())
+    return Counter(op.recipient for op in operations) == required
+
+
+def transfer(operation: Operation, env: str = "devnet") -> None:
+    """Transfers the planned SPL token to its recipient, logging the outcome and the latency"""
+    # Interpolates the bash command with the correct params
+    fmt_map = {'token_addr': operation.token, 'dest_addr': operation.recipient}
+    cmd = TRANSFER_CMD.format_map(fmt_map)
+
+    # Runs the command in bash and returns a message based on the exit status
+    started_at = monotonic()
+    if run_cli(cmd, env).returncode == 0:
+        message = LATENCY_MESSAGES["transfer"].format(
+            token=operation.token, recipient=operation.recipient, seconds=monotonic() - started_at)
+        console.print(f"[green]{message}[/green]", soft_wrap=True)
+    else:
+        console.print(f"[red]SPL transfer {operation.token} to {operation.recipient} failed[/red]")
+
+
+def main(wallet: str,
+         collection_id: str,
+         csv_path: PathLike,
+         env: str = "devnet",
+         source: str = "rarible",
+         endpoints: Optional[str] = None,
+         plan: Optional[PathLike] = None,
+         from_plan: Optional[PathLike] = None,
+         strategy: Strategy = "random",
+         seed: Optional[int] = None,
+         assignment: Optional[PathLike] = None) -> None:
+    """Eucaliptus script entrypoint"""
     # Extracts the full path from filesystem root and the base url for Rarible API
     csv_abspath = abspath(csv_path)
 
@@ -80,35 +232,81 @@ def main(wallet: str, collection_id: str, csv_path: PathLike, env: str = "devnet
     assert isfile(csv_abspath), f"{csv_abspath} is not a file"
     assert which("spl-token") is not None, "'spl-token' command not found or not available"
 
-    # The list of NFT from the given collection owned by us
-    owned_collection_nfts = get_owned_by_collection(wallet, collection_id, env)
+    # Sets up the RPC endpoints shared by all the on-chain operations
+    configure(env, endpoints)
+
     # The transfer destinations and the amount of tokens to be transferred for each
     transfers_list = get_transfers_list(csv_abspath)
+    # The arguments a saved plan must match in order to be executed
+    plan_args = {"wallet": wallet, "collection_id": collection_id, "env": env}
+
+    if from_plan is not None:
+        # Executes exactly the saved operations, as long as they still match the .csv quantities
+        operations = load_plan(from_plan, "transfer", **plan_args).operations
+        matches = matches_transfers(operations, transfers_list)
+        assert matches, f"{from_plan} doesn't match the .csv file"
+    else:
+        # The list of NFT (mint addresses) from the given collection owned by us, with their traits
+        # only if needed by the assignment strategy (a resumed run reuses the saved assignment)
+        resuming = assignment is not None and exists(assignment)
+        traits: Optional[dict[str, Traits]] = None
+        match source:
+            case "rarible":
+                owned_nfts = get_owned_by_collection(wallet, collection_id, env)
+                owned_collection_nfts = [nft.id.split(":").pop() for nft in owned_nfts]
+                if strategy == "rarity" and not resuming:
+                    traits = get_rarible_traits(owned_nfts)
+            case "rpc":
+                owned_collection_nfts = get_owned_on_chain(wallet, collection_id, env)
+                if strategy == "rarity" and not resuming:
+                    traits = get_traits_on_chain(owned_collection_nfts, env)
+            case _:
+                raise ValueError(f"source argument: '{source}' is not supported")
+
+        if resuming:
+            # Resumes a previous run reusing its mapping, if computed with the same arguments
+            operations = load_assignment(assignment, strategy, seed, **plan_args).mapping
+            matches = matches_transfers(operations, transfers_list)
+            assert matches, f"{assignment} doesn't match the .csv file"
+
+            # The tokens not owned anymore are skipped, checking on chain they reached the recipient
+            owned = set(owned_collection_nfts)
+            for operation in (op for op in operations if op.token not in owned):
+                token, recipient = operation.token, operation.recipient
+                if is_held_by(recipient, token, env):
+                    message = f"SPL token {token} already transferred, skipping"
+                    console.print(f"[yellow]{message}[/yellow]")
+                else:
+                    message = f"SPL token {token} left the wallet but {recipient} doesn't hold it"
+                    console.print(f"[red]{message}, skipping[/red]")
+            operations = [op for op in operations if op.token in owned]
+        else:
+            # Assigns the owned tokens to the wallets in the list, reproducibly for the given seed
+            seed = seed if seed is not None else randrange(2**32)
+            allocations = [
+                Allocation(recipient=row.address, quantity=row.quantity, ids=row.ids)
+                for row in transfers_list
+            ]
+            tokens_assignment = assign(owned_collection_nfts, allocations, strategy, seed, traits,
+                                       plan_args)
+            message = f"Tokens assigned with the '{strategy}' strategy (seed {seed})"
+            console.print(f"[green]\n -> {message}[/green]")
 
-    # Aggregate value of the full amount of SPL token to be transferred
-    n_transfers = reduce(lambda acc, t: acc + int(t.quantity), transfers_list, 0)
+            # Exports the mapping so that resumed and dry runs use the identical assignment
+            if assignment is not None:
+                save_assignment(tokens_assignment, assignment)
+            operations = tokens_assignment.mapping
 
-    assert n_transfers <= len(owned_collection_nfts), "More transfers required than token owned"
+    if plan is not None:
+        console.print(describe_plan(make_plan("transfer", plan_args, operations, plan)))
+        return
 
     # ! Debug only, will remove later
     console.print("[red]\n -> SPL token transfer log[/red]")
 
     # Transfers one token at time to all the wallets in the list
-    for transfer in transfers_list:
-        for _ in range(int(transfer.quantity)):
-            # Chooses a NFT from the list and get its SPL token address from the token id
-            # the list isn't sorted so the choice is always pseudo-random
-            token_address = owned_collection_nfts.pop().id.split(":").pop()
-
-            # Interpolates the bash command with the correct params
-            fmt_map = {'token_addr': token_address, 'dest_addr': transfer.address}
-            cmd = TRANSFER_CMD.format_map(fmt_map)
-
-            # Runs the command in bash and returns a message based on the exit status
-            if system(cmd) == 0:
-                console.print(f"[green]SPL transfer {token_address} to {transfer.address} completed[/green]")
-            else:
-                console.print(f"[red]SPL transfer {token_address} to {transfer.address} failed[/red]")
+    for operation in operations:
+        transfer(operation, env)
 
 
 # Eucaliptus script entrypoint, uses fire to generate CLI from function
@@ -3,7 +3,17 @@ Herbs - Lavender.py
 
 This script allows to automate the purge of all the NFTs owned by a Solana wallet.
 It determines the SPL token detained via the Solana CLI tool and proceeds with the purge
-of all the detained tokens.
+of all the detained tokens. The CLI output is parsed incrementally, each account is handed to
+a pool of purge workers as soon as it's read, so the purge overlaps with the enumeration.
+
+All the on-chain operations go through the shared RPC endpoint pool, a comma separated list of
+endpoints (optionally weighted as 'url@weight') can be provided with '--endpoints' or with the
+HERBS_RPC_ENDPOINTS environment variable, otherwise the default RPC URL of the cluster (--env)
+is used. Without '--env' the cluster is the one set in the Solana CLI configuration.
+
+Passing '--plan=plan.json' nothing is purged, the accounts to be purged are saved to the given file
+together with the estimated transactions, fees, rent and duration of the run. The saved plan can
+then be executed exactly with '--from_plan=plan.json'.
 
 ! NOTE: In order for this script to work the Solana CLI must be installed and the
 ! keypair must be set globally with the following command:
@@ -11,17 +21,32 @@ of all the detained tokens.
 
 Example:
     $ python3 lavender.py
+    $ python3 lavender.py --workers=8 --env=devnet --endpoints="http://127.0.0.1:8899"
+    $ python3 lavender.py --plan=plan.json
+    $ python3 lavender.py --from_plan=plan.json
 """
 
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime
-from json import loads
-from os import system
+from json import JSONDecodeError, JSONDecoder
+from os import PathLike
 from os.path import basename
 from shutil import which
-from subprocess import run
+from subprocess import PIPE, Popen
+from sys import stderr
+from tempfile import TemporaryFile
+from threading import BoundedSemaphore
+from time import monotonic
+from typing import Iterable, Iterator, Optional
 
 from fire import Fire
 from rich.console import Console
+from rich.traceback import Traceback
+
+from planner import Operation, describe_plan, load_plan, make_plan
+from planner.costs import LATENCY_MESSAGES
+from chain import get_cli_rpc_url
+from chain.pool import configure, get_pool, run_cli
 
 
 # The bash command to be used in order to get a JSON array of the owned SPL tokens
@@ -30,36 +55,130 @@ LIST_SPL_CMD = "spl-token accounts -v --output json"
 BURN_SPL_CMD = "spl-token burn {account} {quantity}"
 # The bash command format to close an account and withdraw its rent
 CLOSE_ACC_CMD = "spl-token close {token}"
+# The number of characters read at time from the 'spl-token accounts' output
+READ_CHUNK_SIZE = 64 * 1024
 # A shared/sharable console object to pretty print strings
 console = Console(record=True)
 
 
-def main() -> None:
+def stream_spl_tokens(cmd: str = LIST_SPL_CMD, env: str = "devnet") -> Iterator[dict]:
+    """Runs the listing command and yields the entries of its 'accounts' array as they are parsed"""
+    decoder, buffer, in_array, done = JSONDecoder(), "", False, False
+    # The listing is streamed, so it's sent to a single endpoint and it's never retried
+    pool = get_pool(env)
+    endpoint = pool.acquire()
+
+    # The errors are kept aside (a file can't fill up and block the process) to spot endpoint errors
+    with TemporaryFile("w+") as errors:
+        with Popen(cmd.split() + ["--url", endpoint.url], stdout=PIPE, stderr=errors, text=True) as process:
+            for chunk in iter(lambda: process.stdout.read(READ_CHUNK_SIZE), ""):
+                # Keeps draining the output after the array end, so that the process can exit
+                if done:
+                    continue
+                buffer += chunk
+
+                # Skips everything before the beginning of the 'accounts' array
+                if not in_array:
+                    key = buffer.find('"accounts"')
+                    start = buffer.find("[", key) if key != -1 else -1
+                    if start == -1:
+                        continue
+                    buffer, in_array = buffer[start + 1:], True
+
+                # Decodes all the complete objects available, the incomplete tail is kept for the next chunk
+                while True:
+                    buffer = buffer.lstrip(" \t\r\n,")
+                    if buffer.startswith("]"):
+                        done = True
+                        break
+                    try:
+                        spl_token, end = decoder.raw_decode(buffer)
+                    except JSONDecodeError:
+                        break
+                    buffer = buffer[end:]
+                    yield spl_token
+
+        # Reads the errors once the process is over
+        errors.seek(0)
+        error_output = errors.read()
+        stderr.write(error_output)
+
+    pool.report_cli(endpoint, process.returncode, error_output)
+    assert process.returncode == 0, "'spl-token accounts' command execution failed"
+
+
+def to_operation(spl_token: dict) -> Operation:
+    """Maps an entry of the 'spl-token accounts' output to a purge operation"""
+    return Operation(
+        kind="purge",
+        token=spl_token["address"],
+        mint=spl_token["mint"],
+        quantity=int(spl_token["tokenAmount"]["amount"]),
+    )
+
+
+def purge(operation: Operation, env: str = "devnet") -> None:
+    """Burns the given SPL token and closes its account withdrawing the remaining rent"""
+    fmt_map = {"account": operation.token, "quantity": operation.quantity, "token": operation.mint}
+
+    started_at = monotonic()
+    # Burns the current SPL token (transfers it to a burn address)
+    burn_status = run_cli(BURN_SPL_CMD.format_map(fmt_map), env).returncode
+    # Closes the related data account withdrawing the remaining rent
+    close_status = run_cli(CLOSE_ACC_CMD.format_map(fmt_map), env).returncode
+
+    if burn_status == 0 and close_status == 0:
+        message = LATENCY_MESSAGES["purge"].format(token=operation.token, seconds=monotonic() - started_at)
+        console.print(f"[green]{message}[/green]", soft_wrap=True)
+    else:
+        console.print(f"[red]Error during purge of token {operation.token}[/red]")
+
+
+def main(workers: int = 4,
+         env: Optional[str] = None,
+         endpoints: Optional[str] = None,
+         plan: Optional[PathLike] = None,
+         from_plan: Optional[PathLike] = None) -> None:
     """Lavender script entrypoint"""
     # Arguments and dependency checking
     assert which("spl-token") is not None, "'spl-token' command not found or not available"
+    assert workers > 0, "At least one purge worker is required"
+
+    # Without a cluster the one set in the Solana CLI configuration is used, as the CLI would do
+    if env is None:
+        assert which("solana") is not None, "'solana' command not found or not available"
+        env = get_cli_rpc_url()
+
+    # Sets up the RPC endpoints shared by all the on-chain operations
+    configure(env, endpoints)
+
+    # Either the exact operations of a saved plan or the ones streamed from the accounts listing
+    if from_plan is not None:
+        operations: Iterable[Operation] = load_plan(from_plan, "purge", env=env).operations
+    else:
+        operations = map(to_operation, stream_spl_tokens(env=env))
+
+    if plan is not None:
+        purge_plan = make_plan("purge", {"env": env}, list(operations), plan, workers)
+        console.print(describe_plan(purge_plan))
+        return
+
+    # Limits the accounts waiting to be purged, so that memory doesn't grow with the wallet size
+    pending = BoundedSemaphore(workers * 2)
+
+    def on_purge_done(future: Future) -> None:
+        """Frees a pending slot and logs the errors raised by the purge worker (if any)"""
+        pending.release()
+        if (error := future.exception()) is not None:
+            console.print("[red]An unexpected error occurred during the purge[/red]")
+            console.print(Traceback.from_exception(type(error), error, error.__traceback__))
 
-    status = run(LIST_SPL_CMD.split(), check=False, capture_output=True)
-    assert status.returncode == 0, "'spl-token accounts' command execution failed"
-
-    spl_token_list = loads(status.stdout)["accounts"]
-
-    # Burns one token at time until all NFTs are purged
-    for spl_token in spl_token_list:
-        fmt_map = {
-            "account": spl_token["address"],
-            "quantity": spl_token["tokenAmount"]["amount"],
-            "token": spl_token["mint"]
-        }
-        # Burns the current SPL token (transfers it to a burn address)
-        burn_status = system(BURN_SPL_CMD.format_map(fmt_map))
-        # Closes the related data account withdrawing the remaining rent
-        close_status = system(CLOSE_ACC_CMD.format_map(fmt_map))
-
-        if burn_status == 0 and close_status == 0:
-            console.print(f"[green]Successfully purged token {spl_token['address']}[/green]")
-        else:
-            console.print(f"[red]Error during purge of token {spl_token['address']}[/red]")
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # Purges the SPL tokens concurrently while they are still being enumerated
+        for operation in operations:
+            pending.acquire()
+            future = executor.submit(purge, operation, env)
+            future.add_done_callback(on_purge_done)
 
 
 # Lavender script entrypoint, uses fire to generate CLI from function
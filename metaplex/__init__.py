@@ -14,6 +14,8 @@ CM_REPO_URL = "https://github.com/metaplex-foundation/metaplex.git"
 CM_OUT_PATH = abspath("./dependency/metaplex")
 # The base command to be executed
 CM_CLI_CMD = "ts-node ./dependency/metaplex/js/packages/cli/src/candy-machine-v2-cli.ts"
+# The Candy Machine CLI option to set the RPC URL (provided by the shared endpoint pool)
+CM_RPC_FLAG = "-r"
 # The command for setting the keypair
 CM_SOL_SET = "solana config set"
 
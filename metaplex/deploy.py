@@ -1,13 +1,10 @@
-from os import PathLike, remove, system
+from os import PathLike
 from os.path import abspath, basename, join
 
-from genericpath import exists, isfile
 from rich import print as log
 
-from metaplex import CM_CLI_CMD
-
-# Path to the output log file
-LOG_FILE_PATH = "./upload.log"
+from metaplex import CM_CLI_CMD, CM_RPC_FLAG
+from chain.pool import MAX_RETRIES, run_cli
 
 
 def deploy_nfts(project_path: PathLike, env: str = "devnet") -> None:
@@ -49,18 +46,15 @@ def upload(project_path: PathLike, env: str = "devnet") -> str:
 
     # Executes the shell command that upload all the assets to the specified storage provider
     cmd = f"{CM_CLI_CMD} upload -e {net} -k {keypair} -cp {config} -c {project} {assets}"
+    # The upload resumes from the project cache, so it's safe to retry it when rate limited
+    result = run_cli(cmd, env, CM_RPC_FLAG, retries=MAX_RETRIES)
     # Asserts the exit status code to be success
-    assert system(f"{cmd} > {LOG_FILE_PATH}") == 0, "Upload command has failed"
-    # Asserts the existence of the log file with the upload cmd output
-    assert exists(LOG_FILE_PATH), "Upload log file not created"
-    assert isfile(LOG_FILE_PATH), "Upload log file isn't a file"
+    assert result.returncode == 0, "Upload command has failed"
 
-    for out_line in open(LOG_FILE_PATH, "r", encoding="utf-8").readlines():
+    for out_line in result.stdout.splitlines():
         if 'Collection mint address' in out_line:
-            # Removes the log file from the cwd
-            remove(LOG_FILE_PATH)
             # Extracts from the line the mint address of the Candy Machine
-            return out_line.split(":")[1].lstrip()
+            return out_line.split(":")[1].strip()
 
 
 def verify_upload(project_path: PathLike, env: str = "devnet") -> str:
@@ -74,8 +68,9 @@ def verify_upload(project_path: PathLike, env: str = "devnet") -> str:
     project_name, keypair_path = basename(project_path), join(project_abspath, "keypair.json")
 
     # Executes the shell command and asserts on the exit code to be a success
-    exit_status = system(f"{CM_CLI_CMD} verify_upload -e {env} -k {keypair_path} -c {project_name}")
-    assert exit_status == 0, "Upload verification failed"
+    cmd = f"{CM_CLI_CMD} verify_upload -e {env} -k {keypair_path} -c {project_name}"
+    result = run_cli(cmd, env, CM_RPC_FLAG, retries=MAX_RETRIES)
+    assert result.returncode == 0, "Upload verification failed"
 
 
 def set_collection(mint_address: str, project_path: PathLike, env: str = "devnet") -> None:
@@ -91,4 +86,4 @@ def set_collection(mint_address: str, project_path: PathLike, env: str = "devnet
 
     # Executes the shell command and asserts on the exit code to be a success
     cmd = f"{CM_CLI_CMD} set_collection -e {env} -k {keypair_path} -c {project_name} -m {mint_address}"
-    assert system(cmd) == 0, "upload command failed"
+    assert run_cli(cmd, env, CM_RPC_FLAG).returncode == 0, "upload command failed"
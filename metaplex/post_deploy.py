@@ -1,9 +1,14 @@
-from os import PathLike, system
+from os import PathLike
 from os.path import abspath, basename, join
+from time import monotonic
+from typing import Optional
 
 from rich import print as log
 
-from metaplex import CM_CLI_CMD
+from metaplex import CM_CLI_CMD, CM_RPC_FLAG
+from planner import Operation, describe_plan, load_plan, make_plan
+from planner.costs import LATENCY_MESSAGES
+from chain.pool import run_cli
 
 
 def withdraw_rent(cm_address: str, key_path: PathLike, env: str = "devnet") -> None:
@@ -14,7 +19,7 @@ def withdraw_rent(cm_address: str, key_path: PathLike, env: str = "devnet") -> N
     """
     # Executes the shell command and asserts on the exit code to be a success
     cmd = f"{CM_CLI_CMD} withdraw {cm_address} -e {env} -k {abspath(key_path)}"
-    assert system(cmd) == 0, "'Withdraw Rent' command failed"
+    assert run_cli(cmd, env, CM_RPC_FLAG).returncode == 0, "'Withdraw Rent' command failed"
 
     log(f"[green]Withdrawn rent successfully from CM {cm_address}[/green]")
 
@@ -28,20 +33,37 @@ def sign_all(project_path: PathLike, env: str = "devnet") -> None:
 
     # Executes the shell command and asserts on the exit code to be a success
     cmd = f"{CM_CLI_CMD} sign_all -e {env} -k {key_abspath} -c {project_name}"
-    assert system(cmd) == 0, "'Sign All' command failed"
+    assert run_cli(cmd, env, CM_RPC_FLAG).returncode == 0, "'Sign All' command failed"
 
     log("[green]All NFTs signed successfully[/green]")
 
 
-def mint(project_path: PathLike, num: int = 1, env: str = "devnet") -> None:
+def mint(project_path: PathLike,
+         num: int = 1,
+         env: str = "devnet",
+         plan: Optional[PathLike] = None,
+         from_plan: Optional[PathLike] = None) -> None:
     """
     Allow to mint one or more token for the given project Candy Machine.
+    With 'plan' nothing is minted, the estimated cost and duration are saved to the given path
+    instead, while 'from_plan' mints exactly the amount of tokens of a previously saved plan.
     """
     # Derives the needed data/file from project path
     key_abspath, project_name = join(abspath(project_path), "keypair.json"), basename(project_path)
+    # The arguments a saved plan must match in order to be executed
+    plan_args = {"project": project_name, "env": env}
+
+    if from_plan is not None:
+        num = len(load_plan(from_plan, "mint", **plan_args).operations)
+
+    if plan is not None:
+        operations = [Operation(kind="mint") for _ in range(num)]
+        log(describe_plan(make_plan("mint", plan_args, operations, plan)))
+        return
 
     # Executes the shell command and asserts on the exit code to be a success
+    started_at = monotonic()
     cmd = f"{CM_CLI_CMD} mint_multiple_tokens -e {env} -k {key_abspath} -c {project_name} --number {num}"
-    assert system(cmd) == 0, "Minting command failed"
+    assert run_cli(cmd, env, CM_RPC_FLAG).returncode == 0, "Minting command failed"
 
-    log(f"[green]{num} NFTs successfully minted[/green]")
+    log(f"[green]{LATENCY_MESSAGES['mint'].format(count=num, seconds=monotonic() - started_at)}[/green]")
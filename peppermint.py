@@ -24,14 +24,16 @@ from datetime import datetime
 from os.path import basename
 
 from fire import Fire
-from rich.console import Console
+from rich import get_console
 
 from metaplex.deploy import deploy_nfts
 from metaplex.post_deploy import mint, sign_all, withdraw_rent
 from metaplex.verify import verify_project
 
-# A shared/sharable console object to pretty print strings
-console = Console(record=True)
+# A shared/sharable console object to pretty print strings, it's the global rich console
+# so that the output of the metaplex modules ends up in the saved log as well
+console = get_console()
+console.record = True
 
 # A list of all the available subcommands (each one of them has a specific 'scope')
 subcommands = {
@@ -0,0 +1,91 @@
+""" Dry-run planner, describes the on-chain operations of a run and estimates their cost """
+
+from datetime import datetime
+from json import load as json2dict
+from os import PathLike
+from typing import Any, Literal, Optional
+
+from pydantic import BaseModel, NonNegativeFloat, NonNegativeInt
+
+# The number of lamports in one SOL
+LAMPORTS_PER_SOL = 1_000_000_000
+# The kind of on-chain operations that can be planned
+OperationKind = Literal["transfer", "purge", "mint"]
+
+
+class Operation(BaseModel):
+    """A single planned on-chain operation"""
+    kind: OperationKind
+    token: Optional[str] = None  # The SPL token mint (transfer) or token account (purge) address
+    mint: Optional[str] = None  # The SPL token mint address (purge)
+    recipient: Optional[str] = None  # The destination wallet (transfer)
+    quantity: NonNegativeInt = 1  # The amount of SPL token involved
+
+
+class Estimate(BaseModel):
+    """The estimated cost (in lamports) and duration (in seconds) of the planned operations"""
+    transactions: NonNegativeInt
+    batched_transactions: NonNegativeInt
+    fees: NonNegativeInt
+    batched_fees: NonNegativeInt
+    rent: int  # Negative when the rent is withdrawn (e.g. closing accounts)
+    latency: NonNegativeFloat  # The expected latency of a single operation
+    duration: NonNegativeFloat
+
+
+class Plan(BaseModel):
+    """The full plan of a run, it can be saved as JSON and executed later on"""
+    kind: OperationKind
+    created_at: datetime
+    args: dict[str, Any]  # The arguments the plan was computed with
+    operations: list[Operation]
+    estimate: Estimate
+
+
+def save_plan(plan: Plan, plan_path: PathLike) -> None:
+    """Writes the given plan as JSON to the given path"""
+    with open(plan_path, "w", encoding="utf-8") as plan_file:
+        plan_file.write(plan.json(indent=2))
+
+
+def load_plan(plan_path: PathLike, kind: OperationKind, **args: Any) -> Plan:
+    """Reads a plan from the given path, asserting it was computed for the same kind and arguments"""
+    plan = Plan(**json2dict(open(plan_path, "r", encoding="utf-8")))
+
+    assert plan.kind == kind, f"{plan_path} is a '{plan.kind}' plan, not a '{kind}' one"
+    for name, value in args.items():
+        assert plan.args.get(name, None) == value, f"{plan_path} was planned with a different '{name}'"
+
+    return plan
+
+
+def make_plan(kind: OperationKind,
+              args: dict[str, Any],
+              operations: list[Operation],
+              plan_path: PathLike,
+              workers: int = 1) -> Plan:
+    """Estimates the given operations, executed by the given number of workers, and saves the plan"""
+    # Imported here, the estimates module depends on the models above
+    from planner.costs import estimate
+
+    plan = Plan(
+        kind=kind,
+        created_at=datetime.now(),
+        args=args,
+        operations=operations,
+        estimate=estimate(kind, len(operations), workers),
+    )
+    save_plan(plan, plan_path)
+    return plan
+
+
+def describe_plan(plan: Plan) -> str:
+    """Returns a human readable (rich markup) summary of the given plan"""
+    est = plan.estimate
+    return "\n".join([
+        f"[green]\n -> Planned {plan.kind} operations (n. {len(plan.operations)})[/green]",
+        f"[yellow]\tTransactions: {est.transactions} ({est.batched_transactions} if batched)[/yellow]",
+        f"[yellow]\tFees: {est.fees / LAMPORTS_PER_SOL:.6f} SOL ({est.batched_fees / LAMPORTS_PER_SOL:.6f} SOL if batched)[/yellow]",
+        f"[yellow]\tRent: {est.rent / LAMPORTS_PER_SOL:.6f} SOL[/yellow]",
+        f"[yellow]\tExpected duration: {est.duration:.0f}s ({est.latency:.2f}s per operation)[/yellow]",
+    ])
@@ -0,0 +1,147 @@
+""" Deterministic token -> recipient assignment engine """
+
+from collections import Counter
+from json import load as json2dict
+from math import log
+from os import PathLike
+from random import Random
+from typing import Any, Literal, Optional
+
+from pydantic import BaseModel, PositiveInt
+
+from planner import Operation
+
+# The available assignment strategies:
+# - random: seeded random sample of the owned tokens
+# - rarity: every recipient gets tokens spread across the whole rarity distribution
+# - exact: every token is chosen explicitly with the 'ids' of the allocations
+Strategy = Literal["random", "rarity", "exact"]
+# The NFT traits as (trait_type, value) pairs
+Traits = list[tuple[str, str]]
+
+
+class Allocation(BaseModel):
+    """The amount of tokens (optionally the exact ones) to be assigned to a recipient"""
+    recipient: str
+    quantity: PositiveInt
+    ids: list[str] = []
+
+
+class Assignment(BaseModel):
+    """A reproducible token -> recipient mapping, it can be exported and reused by later runs"""
+    strategy: Strategy
+    seed: int
+    args: dict[str, Any] = {}  # The arguments the assignment was computed with
+    mapping: list[Operation]
+
+
+def save_assignment(assignment: Assignment, assignment_path: PathLike) -> None:
+    """Writes the given assignment as JSON to the given path"""
+    with open(assignment_path, "w", encoding="utf-8") as assignment_file:
+        assignment_file.write(assignment.json(indent=2))
+
+
+def load_assignment(assignment_path: PathLike, strategy: Strategy, seed: Optional[int] = None, **args: Any) -> Assignment:
+    """
+    Reads an assignment from the given path, asserting it was computed with the same strategy,
+    seed (unless not given) and arguments.
+    """
+    assignment = Assignment(**json2dict(open(assignment_path, "r", encoding="utf-8")))
+
+    assert assignment.strategy == strategy, f"{assignment_path} was assigned with the '{assignment.strategy}' strategy"
+    assert seed is None or assignment.seed == seed, f"{assignment_path} was assigned with the seed {assignment.seed}"
+    for name, value in args.items():
+        assert assignment.args.get(name, None) == value, f"{assignment_path} was assigned with a different '{name}'"
+
+    return assignment
+
+
+def rarity_scores(traits: dict[str, Traits]) -> dict[str, float]:
+    """Scores each token with the information content of its traits, the rarer the higher"""
+    counts = Counter(trait for token_traits in traits.values() for trait in set(token_traits))
+    total = len(traits)
+    return {
+        token: sum(-log(counts[trait] / total) for trait in set(token_traits))
+        for token, token_traits in traits.items()
+    }
+
+
+def interleave(allocations: list[tuple[int, int]], rng: Random) -> list[int]:
+    """
+    Returns the allocation indexes (each one repeated 'quantity' times) ordered so that every
+    allocation is spread evenly along the list, proportionally to its quantity. Allocations in
+    the same round are ordered with a seeded shuffle, reversed every other round (serpentine),
+    so that no allocation is favored by its position in the .csv file.
+    """
+    order = {index: position for position, (index, _) in enumerate(rng.sample(allocations, len(allocations)))}
+    slots = [
+        ((k + 0.5) / quantity, order[index] if k % 2 == 0 else -order[index], index)
+        for index, quantity in allocations
+        for k in range(quantity)
+    ]
+    return [index for _, _, index in sorted(slots)]
+
+
+def assign(tokens: list[str],
+           allocations: list[Allocation],
+           strategy: Strategy = "random",
+           seed: int = 0,
+           traits: Optional[dict[str, Traits]] = None,
+           args: Optional[dict[str, Any]] = None) -> Assignment:
+    """
+    Assigns the given tokens to the allocations recipients, the exact 'ids' are always honored
+    and the remaining quantities are filled with the given strategy. The result only depends
+    on the given arguments (not on the tokens order) and runs in O(n log n). The 'args' are only
+    stored in the assignment, to check it's reused with the same ones.
+    """
+    # Sorting makes the result independent from the order in which the tokens were retrieved
+    available, rng = sorted(set(tokens)), Random(seed)
+    owned, assigned = set(available), set()
+    mapping: list[tuple[int, str]] = []
+
+    # Assigns first the tokens explicitly requested by each allocation
+    for index, allocation in enumerate(allocations):
+        assert len(allocation.ids) <= allocation.quantity, f"Too many ids for {allocation.recipient}"
+        for token in allocation.ids:
+            assert token in owned, f"Token {token} isn't owned"
+            assert token not in assigned, f"Token {token} is assigned more than once"
+            assigned.add(token)
+            mapping.append((index, token))
+
+    # The remaining quantity of each allocation, spread evenly along the assignment order
+    remaining = [(index, a.quantity - len(a.ids)) for index, a in enumerate(allocations) if a.quantity > len(a.ids)]
+    slots = interleave(remaining, rng)
+    available = [token for token in available if token not in assigned]
+
+    assert strategy != "exact" or not slots, "The 'exact' strategy requires the ids of every token"
+    assert len(slots) <= len(available), "More transfers required than token owned"
+
+    match strategy:
+        case "random":
+            chosen = rng.sample(available, len(slots))
+        case "rarity":
+            assert traits is not None, "The 'rarity' strategy requires the tokens traits"
+            scores = rarity_scores({token: traits.get(token, []) for token in available})
+            # Ranks the tokens from the rarest, ties are broken randomly (but reproducibly)
+            tie_breaks = {token: rng.random() for token in available}
+            ranked = sorted(available, key=lambda t: (-scores[t], tie_breaks[t]))
+            # Picks tokens evenly spaced along the ranking, so that the distribution is preserved
+            chosen = [ranked[int((i + 0.5) * len(ranked) / len(slots))] for i in range(len(slots))]
+        case "exact":
+            chosen = []
+        case _:
+            raise ValueError(f"strategy argument: '{strategy}' is not supported")
+
+    mapping.extend(zip(slots, chosen))
+    # Keeps the allocations (.csv rows) order, the sort is stable
+    mapping.sort(key=lambda item: item[0])
+
+    return Assignment(
+        strategy=strategy,
+        seed=seed,
+        args=args or {},
+        mapping=[
+            Operation(kind="transfer", token=token, recipient=allocations[index].recipient)
+            for index, token in mapping
+        ],
+    )
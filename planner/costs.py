@@ -0,0 +1,103 @@
+""" Fees, rent and duration estimation for the planned operations """
+
+from glob import glob
+from math import ceil
+from os import PathLike
+from os.path import join
+from re import Pattern, escape
+from re import compile as regex
+from statistics import median
+from string import Formatter
+
+from pydantic import BaseModel, NonNegativeInt, PositiveInt
+
+from planner import Estimate, OperationKind
+
+# The fee paid for each signature of a transaction (in lamports)
+SIGNATURE_FEE = 5000
+# The size (in bytes) of the accounts created by the operations
+TOKEN_ACCOUNT_SIZE, MINT_ACCOUNT_SIZE, METADATA_SIZE, MASTER_EDITION_SIZE = 165, 82, 679, 282
+# The folder in which the scripts save their logs
+LOGS_PATH = "logs"
+# The per operation latency (in seconds) used when no previous run is available
+DEFAULT_LATENCY = {"transfer": 2.0, "purge": 4.0, "mint": 3.0}
+# The log messages reporting the latency of an operation (the mint one covers 'count' tokens),
+# the saved logs are parsed back with the same formats, so they must never be wrapped (soft_wrap)
+LATENCY_MESSAGES = {
+    "transfer": "SPL transfer {token} to {recipient} completed ({seconds:.2f}s)",
+    "purge": "Successfully purged token {token} ({seconds:.2f}s)",
+    "mint": "{count} NFTs successfully minted ({seconds:.2f}s)",
+}
+# The patterns matching the numeric fields of the messages, any other field is a single word
+FIELD_PATTERNS = {"seconds": r"(?P<seconds>\d+(\.\d+)?)", "count": r"(?P<count>\d+)"}
+
+
+def latency_pattern(message: str) -> Pattern:
+    """Returns the regex matching the log lines printed with the given message format"""
+    pattern = ""
+    for literal, field, _, _ in Formatter().parse(message):
+        pattern += escape(literal) + (FIELD_PATTERNS.get(field, r"\S+") if field is not None else "")
+    return regex(pattern)
+
+
+LATENCY_PATTERNS = {kind: latency_pattern(message) for kind, message in LATENCY_MESSAGES.items()}
+
+
+def rent_exempt(size: int) -> int:
+    """Returns the minimum balance (in lamports) for an account of the given size to be rent exempt"""
+    # Default rent of 3480 lamports per byte-year (128 bytes of account overhead) for two years
+    return (size + 128) * 3480 * 2
+
+
+class OperationCost(BaseModel):
+    """The on-chain footprint of a single operation"""
+    transactions: PositiveInt  # Transactions sent when operations are executed one by one
+    signatures: PositiveInt  # Signatures required by each transaction
+    rent: int  # Rent paid (or withdrawn when negative) by the operation
+    batch_size: PositiveInt  # Operations that fit in a single transaction when batched
+
+
+OPERATION_COSTS = {
+    # Creates and funds the recipient's associated token account, then transfers the token
+    "transfer": OperationCost(transactions=1, signatures=1, rent=rent_exempt(TOKEN_ACCOUNT_SIZE), batch_size=5),
+    # Burns the token and closes its account (two separate commands), withdrawing its rent
+    "purge": OperationCost(transactions=2, signatures=1, rent=-rent_exempt(TOKEN_ACCOUNT_SIZE), batch_size=8),
+    # Creates mint, token, metadata and master edition accounts, signed by the payer and the new mint
+    "mint": OperationCost(
+        transactions=1,
+        signatures=2,
+        rent=sum(rent_exempt(size) for size in (MINT_ACCOUNT_SIZE, TOKEN_ACCOUNT_SIZE, METADATA_SIZE, MASTER_EDITION_SIZE)),
+        batch_size=1,
+    ),
+}
+
+
+def get_latency(kind: OperationKind, logs_path: PathLike = LOGS_PATH) -> float:
+    """Returns the median latency of the given operation kind found in the previous runs' logs"""
+    pattern, latencies = LATENCY_PATTERNS[kind], []
+
+    for log_path in glob(join(logs_path, "*.log")):
+        for line in open(log_path, "r", encoding="utf-8"):
+            if (match := pattern.search(line)) is not None:
+                count = max(int(match.groupdict().get("count", None) or 1), 1)
+                latencies.extend([float(match["seconds"]) / count] * count)
+
+    return median(latencies) if latencies else DEFAULT_LATENCY[kind]
+
+
+def estimate(kind: OperationKind, count: NonNegativeInt, workers: PositiveInt = 1) -> Estimate:
+    """Estimates fees, rent and duration of 'count' operations executed by the given number of workers"""
+    cost, latency = OPERATION_COSTS[kind], get_latency(kind)
+
+    transactions = count * cost.transactions
+    batched_transactions = ceil(count / cost.batch_size)
+
+    return Estimate(
+        transactions=transactions,
+        batched_transactions=batched_transactions,
+        fees=transactions * cost.signatures * SIGNATURE_FEE,
+        batched_fees=batched_transactions * cost.signatures * SIGNATURE_FEE,
+        rent=count * cost.rent,
+        latency=latency,
+        duration=ceil(count / workers) * latency,
+    )
@@ -11,14 +11,20 @@ RARIBLE_API = {
 }
 
 
+class RaribleAttribute(BaseModel):
+    """Validator class to type annotate the 'attributes' field in the RaribleMetadata object"""
+    key: str
+    value: Optional[str] = None
+
+
 class RaribleMetadata(BaseModel):
     """Validator class to type annotate the 'metadata' field in the RaribleNFT object"""
     name: str
     description: str
     tags: list[str]
     genres: list[str]
+    attributes: list[RaribleAttribute] = []
 
-    # ? Not needed now =>  attributes: list[RaribleAttributes]
     # ? Not needed now =>  content: list[RaribleAsset]
     # ? Not needed now =>   restrictions: list[unknown]
 
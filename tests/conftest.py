@@ -0,0 +1,76 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from json import dumps, loads
+from threading import Thread
+from typing import Any, Callable, Optional
+
+import pytest
+
+from chain import pool
+
+
+class StubRPC(ThreadingHTTPServer):
+    """
+    Local JSON RPC endpoint stub, the results of each method are computed by the given handlers
+    (42 by default). It answers with 429 to the first 'throttled' requests.
+    """
+
+    def __init__(self, throttled: int = 0, healthy: bool = True, methods: Optional[dict[str, Callable[[list], Any]]] = None):
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.throttled, self.healthy, self.methods = throttled, healthy, methods or {}
+        self.requests, self.params = [], []
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_port}"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = loads(self.rfile.read(int(self.headers["Content-Length"])))
+        method, params = body["method"], body.get("params", [])
+
+        if method == "getHealth":
+            response = {"result": "ok"} if self.server.healthy else {"error": {"message": "Node is behind"}}
+        else:
+            self.server.requests.append(method)
+            self.server.params.append(params)
+            if len(self.server.requests) <= self.server.throttled:
+                self.send_response(429)
+                self.end_headers()
+                return
+            response = {"result": self.server.methods.get(method, lambda params: 42)(params)}
+
+        data = dumps({"jsonrpc": "2.0", "id": 1, **response}).encode()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+@pytest.fixture
+def stubs():
+    """Starts local JSON RPC stubs, stopping them at the end of the test"""
+    servers = []
+
+    def start(**kwargs) -> StubRPC:
+        server = StubRPC(**kwargs)
+        Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture(autouse=True)
+def fresh_pools(monkeypatch):
+    """Every test configures its own endpoint pools, without waiting for backoffs"""
+    monkeypatch.setattr(pool, "_pools", {})
+    monkeypatch.setattr(pool, "BACKOFF_BASE", 0)
+    monkeypatch.delenv(pool.ENDPOINTS_ENV_VAR, raising=False)
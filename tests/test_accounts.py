@@ -0,0 +1,96 @@
+from base64 import b64encode
+from struct import pack
+from typing import Optional
+
+from base58 import b58decode, b58encode
+
+from chain import MAX_MULTIPLE_ACCOUNTS
+from chain.accounts import get_multiple_accounts
+from chain.metadata import get_metadata_address
+from eucaliptus import get_owned_on_chain
+
+WALLET = b58encode(bytes(range(32))).decode()
+COLLECTION = b58encode(bytes(range(32, 64))).decode()
+OTHER = b58encode(bytes(range(64, 96))).decode()
+
+
+def mint_address(n: int) -> str:
+    return b58encode(bytes([n]) * 32).decode()
+
+
+def borsh_str(value: str, size: int) -> bytes:
+    data = value.encode().ljust(size, b"\x00")
+    return pack("<I", len(data)) + data
+
+
+def metadata_data(mint: str, creator: tuple[str, bool], collection: Optional[tuple[str, bool]] = None) -> bytes:
+    """Builds the raw data of a metadata account with a single creator and an optional collection"""
+    data = bytes([4]) + b58decode(WALLET) + b58decode(mint)
+    data += borsh_str("Herb", 32) + borsh_str("HERB", 10) + borsh_str("https://arweave.net/x", 200)
+    data += pack("<H", 500) + b"\x01" + pack("<I", 1) + b58decode(creator[0]) + bytes([creator[1], 100])
+    data += b"\x01\x01" + b"\x01\xfe" + b"\x00"
+    data += (b"\x01" + bytes([collection[1]]) + b58decode(collection[0])) if collection else b"\x00"
+    return data.ljust(679, b"\x00")
+
+
+def token_account(mint: str, amount: int = 1, decimals: int = 0) -> dict:
+    info = {"mint": mint, "owner": WALLET, "tokenAmount": {"amount": str(amount), "decimals": decimals}}
+    return {"pubkey": mint_address(200), "account": {"data": {"parsed": {"info": info}}}}
+
+
+def accounts_stub(data: dict[str, bytes]):
+    """A stub serving the given raw accounts, the missing ones are returned as null"""
+
+    def get_multiple_accounts_result(params: list) -> dict:
+        return {
+            "value": [
+                None if address not in data else {"data": [b64encode(data[address]).decode(), "base64"]}
+                for address in params[0]
+            ]
+        }
+
+    return get_multiple_accounts_result
+
+
+def test_get_multiple_accounts_is_chunked(stubs):
+    addresses = [b58encode(i.to_bytes(32, "big")).decode() for i in range(1, 251)]
+    data = {address: address.encode() for address in addresses[::2]}
+    stub = stubs(methods={"getMultipleAccounts": accounts_stub(data)})
+
+    accounts = get_multiple_accounts(addresses, stub.url)
+
+    assert stub.requests == ["getMultipleAccounts"] * 3
+    assert [len(params[0]) for params in stub.params] == [MAX_MULTIPLE_ACCOUNTS, MAX_MULTIPLE_ACCOUNTS, 50]
+    assert accounts == {address: data.get(address, None) for address in addresses}
+
+
+def test_get_owned_on_chain_filters_collection(stubs):
+    verified_collection, verified_creator, unverified_collection, other_collection = map(mint_address, range(1, 5))
+    fungible, with_decimals, without_metadata = map(mint_address, range(5, 8))
+    metadata = {
+        verified_collection: metadata_data(verified_collection, (OTHER, True), (COLLECTION, True)),
+        # Not part of a collection, the Candy Machine creator is used instead
+        verified_creator: metadata_data(verified_creator, (COLLECTION, True)),
+        unverified_collection: metadata_data(unverified_collection, (OTHER, True), (COLLECTION, False)),
+        # The verified collection takes precedence over the creators
+        other_collection: metadata_data(other_collection, (COLLECTION, True), (OTHER, True)),
+        fungible: metadata_data(fungible, (COLLECTION, True), (COLLECTION, True)),
+        with_decimals: metadata_data(with_decimals, (COLLECTION, True), (COLLECTION, True)),
+    }
+    accounts = [
+        token_account(verified_collection),
+        token_account(verified_creator),
+        token_account(unverified_collection),
+        token_account(other_collection),
+        token_account(fungible, amount=5),
+        token_account(with_decimals, decimals=6),
+        token_account(without_metadata),
+    ]
+    stub = stubs(methods={
+        "getTokenAccountsByOwner": lambda params: {"value": accounts},
+        "getMultipleAccounts": accounts_stub({get_metadata_address(m): d for m, d in metadata.items()}),
+    })
+
+    assert get_owned_on_chain(WALLET, COLLECTION, stub.url) == [verified_collection, verified_creator]
+    # Only the NFTs (single token, no decimals) are looked up
+    assert len(stub.params[1][0]) == 5
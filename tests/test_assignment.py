@@ -0,0 +1,88 @@
+from random import Random
+from statistics import mean
+
+import pytest
+
+from planner.assignment import Allocation, assign, load_assignment, rarity_scores, save_assignment
+
+TOKENS = [f"mint{i:04d}" for i in range(1000)]
+# A tenth of the tokens has the rare 'gold' fur
+TRAITS = {token: [("fur", "gold" if i % 10 == 0 else "brown"), ("eyes", str(i % 7))] for i, token in enumerate(TOKENS)}
+ALLOCATIONS = [Allocation(recipient=f"wallet{i}", quantity=q) for i, q in enumerate([200, 100, 100, 50, 1])]
+
+
+def pairs(assignment):
+    return [(op.token, op.recipient) for op in assignment.mapping]
+
+
+@pytest.mark.parametrize("strategy", ["random", "rarity"])
+def test_same_result_for_any_tokens_order(strategy):
+    expected = assign(TOKENS, ALLOCATIONS, strategy, 42, TRAITS)
+
+    for shuffle_seed in range(5):
+        shuffled = TOKENS[:]
+        Random(shuffle_seed).shuffle(shuffled)
+        assert pairs(assign(shuffled, ALLOCATIONS, strategy, 42, TRAITS)) == pairs(expected)
+
+    assert pairs(assign(TOKENS, ALLOCATIONS, strategy, 43, TRAITS)) != pairs(expected)
+
+
+@pytest.mark.parametrize("strategy", ["random", "rarity"])
+def test_quantities_are_respected(strategy):
+    assignment = assign(TOKENS, ALLOCATIONS, strategy, 7, TRAITS)
+    tokens = [token for token, _ in pairs(assignment)]
+
+    assert len(set(tokens)) == len(tokens) == 451
+    for allocation in ALLOCATIONS:
+        assert [r for _, r in pairs(assignment)].count(allocation.recipient) == allocation.quantity
+
+
+def test_rarity_is_balanced_among_recipients():
+    scores = rarity_scores(TRAITS)
+    allocations = [Allocation(recipient=f"wallet{i}", quantity=20) for i in range(10)]
+    received = {}
+    for token, recipient in pairs(assign(TOKENS, allocations, "rarity", 1, TRAITS)):
+        received.setdefault(recipient, []).append(scores[token])
+
+    averages = [mean(recipient_scores) for recipient_scores in received.values()]
+    assert max(averages) - min(averages) < 0.05 * mean(averages)
+
+
+def test_rare_tokens_are_not_bound_to_csv_order():
+    # 10 rare tokens among 100, 5 of them are picked for 10 recipients
+    tokens = TOKENS[:100]
+    allocations = [Allocation(recipient=name, quantity=5) for name in "ABCDEFGHIJ"]
+    rare_recipients = set()
+    for seed in range(10):
+        rare = {r for t, r in pairs(assign(tokens, allocations, "rarity", seed, TRAITS)) if TRAITS[t][0][1] == "gold"}
+        assert len(rare) == 5
+        rare_recipients.add(frozenset(rare))
+
+    assert len(rare_recipients) > 1
+    assert set().union(*rare_recipients) == set("ABCDEFGHIJ")
+
+
+def test_exact_ids():
+    allocations = [Allocation(recipient="a", quantity=2, ids=["mint0003", "mint0001"]), Allocation(recipient="b", quantity=1)]
+
+    assert pairs(assign(TOKENS, allocations, "random", 0))[:2] == [("mint0003", "a"), ("mint0001", "a")]
+    assert ("mint0003", "b") not in pairs(assign(TOKENS, allocations, "random", 0))
+    with pytest.raises(AssertionError):
+        assign(TOKENS, allocations, "exact", 0)
+    with pytest.raises(AssertionError):
+        assign(TOKENS, [Allocation(recipient="a", quantity=1, ids=["not-owned"])], "exact", 0)
+
+
+def test_saved_assignment_requires_same_arguments(tmp_path):
+    args = {"wallet": "w", "collection_id": "c", "env": "devnet"}
+    path = tmp_path / "assignment.json"
+    save_assignment(assign(TOKENS, ALLOCATIONS, "random", 5, args=args), path)
+
+    assert pairs(load_assignment(path, "random", None, **args)) == pairs(assign(TOKENS, ALLOCATIONS, "random", 5))
+    assert load_assignment(path, "random", 5, **args).seed == 5
+    with pytest.raises(AssertionError):
+        load_assignment(path, "random", 6, **args)
+    with pytest.raises(AssertionError):
+        load_assignment(path, "rarity", None, **args)
+    with pytest.raises(AssertionError):
+        load_assignment(path, "random", None, **{**args, "env": "mainnet"})
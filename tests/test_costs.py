@@ -0,0 +1,62 @@
+from io import StringIO
+
+from rich.console import Console
+
+import eucaliptus
+import lavender
+from planner import Operation, load_plan, make_plan
+from planner.costs import DEFAULT_LATENCY, LATENCY_MESSAGES, estimate, get_latency, rent_exempt
+
+# Real world sized addresses, the log lines are longer than the default console width
+WALLET = "9xQeWvG816bUx9EPjHmaT23yvVM2ZWbrrpZb9PusVFin"
+MINT = "EPjFWdd5AufqSSqeM2qN1xzybapC8G4wEGGkZwyTDt1v"
+ACCOUNT = "5x38Kp4hvdomTCnCrAny4UtMUt5rQBdB6px2K1Ui45Wq"
+
+
+class Completed:
+    returncode = 0
+
+
+def test_latency_from_saved_logs(tmp_path, monkeypatch):
+    # Same console as the scripts one, on a 80 columns (non TTY) terminal
+    console = Console(record=True, width=80, file=StringIO())
+    monkeypatch.setattr(eucaliptus, "console", console)
+    monkeypatch.setattr(lavender, "console", console)
+    monkeypatch.setattr(eucaliptus, "run_cli", lambda *args: Completed())
+    monkeypatch.setattr(lavender, "run_cli", lambda *args: Completed())
+
+    eucaliptus.transfer(Operation(kind="transfer", token=MINT, recipient=WALLET))
+    lavender.purge(Operation(kind="purge", token=ACCOUNT, mint=MINT))
+    (tmp_path / "logs").mkdir()
+    console.save_text(str(tmp_path / "logs" / "run.log"))
+
+    assert get_latency("transfer", tmp_path / "logs") < DEFAULT_LATENCY["transfer"]
+    assert get_latency("purge", tmp_path / "logs") < DEFAULT_LATENCY["purge"]
+
+
+def test_latency_of_multiple_mints(tmp_path):
+    lines = [LATENCY_MESSAGES["mint"].format(count=4, seconds=10), LATENCY_MESSAGES["mint"].format(count=1, seconds=1)]
+    (tmp_path / "run.log").write_text("\n".join(lines))
+    assert get_latency("mint", tmp_path) == 2.5
+    assert get_latency("transfer", tmp_path) == DEFAULT_LATENCY["transfer"]
+
+
+def test_estimate(monkeypatch):
+    monkeypatch.setattr("planner.costs.get_latency", lambda kind: 2.0)
+    purge = estimate("purge", 17, workers=4)
+
+    assert rent_exempt(165) == 2039280
+    assert (purge.transactions, purge.batched_transactions) == (34, 3)
+    assert (purge.fees, purge.batched_fees) == (170000, 15000)
+    assert purge.rent == -17 * 2039280
+    assert purge.duration == 10.0
+
+
+def test_make_plan(tmp_path, monkeypatch):
+    monkeypatch.setattr("planner.costs.get_latency", lambda kind: 2.0)
+    operations = [Operation(kind="purge", token=f"account{i}", mint=f"mint{i}") for i in range(17)]
+
+    plan = make_plan("purge", {"env": "devnet"}, operations, tmp_path / "plan.json", workers=4)
+
+    assert plan.estimate == estimate("purge", 17, workers=4)
+    assert load_plan(tmp_path / "plan.json", "purge", env="devnet") == plan
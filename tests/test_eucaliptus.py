@@ -0,0 +1,31 @@
+from datetime import datetime
+
+from eucaliptus import get_rarible_traits
+from rarible import RaribleNFT
+
+
+def rarible_nft(mint: str, attributes: list[dict]) -> RaribleNFT:
+    meta = {"name": mint, "description": "", "tags": [], "genres": [], "attributes": attributes}
+    return RaribleNFT(
+        id=f"SOLANA:{mint}",
+        blockchain="SOLANA",
+        meta=meta if attributes else None,
+        mintedAt=datetime.now(),
+        lastUpdatedAt=datetime.now(),
+        deleted=False,
+        supply=1,
+        sellers=0,
+        totalStock=1,
+        lazySupply=0,
+    )
+
+
+def test_rarible_traits_skip_missing_values():
+    nfts = [
+        rarible_nft("mint1", [{"key": "Leaf", "value": "Gold"}, {"key": "Stem"}]),
+        rarible_nft("mint2", [{"key": "Leaf", "value": None}, {"key": "Stem", "value": "Long"}]),
+        rarible_nft("mint3", []),
+    ]
+
+    traits = get_rarible_traits(nfts)
+    assert traits == {"mint1": [("Leaf", "Gold")], "mint2": [("Stem", "Long")], "mint3": []}
@@ -0,0 +1,62 @@
+import sys
+from io import StringIO
+from json import dumps
+
+import lavender
+from planner import Operation
+
+ACCOUNTS = [{"address": f"account{i}", "mint": f"mint{i}", "tokenAmount": {"amount": "1", "decimals": 0}} for i in range(500)]
+
+
+class StubEndpoint:
+    url = "http://127.0.0.1:8899"
+
+
+class StubPool:
+    """Endpoint pool stub, it never sends any request"""
+
+    def __init__(self):
+        self.reports = []
+
+    def acquire(self):
+        return StubEndpoint()
+
+    def report_cli(self, endpoint, returncode, output):
+        self.reports.append(returncode)
+
+
+def test_stream_spl_tokens_in_chunks(tmp_path, monkeypatch):
+    # A fake 'spl-token accounts' command writing pretty printed JSON a few characters at time
+    output = dumps({"cliVersion": "1.10.0", "accounts": ACCOUNTS, "fooList": [{"address": "x"}]}, indent=2)
+    script = tmp_path / "accounts.py"
+    script.write_text(
+        f"import sys\nout = {output!r}\n"
+        "for i in range(0, len(out), 37):\n    sys.stdout.write(out[i:i + 37]); sys.stdout.flush()\n"
+    )
+
+    pool = StubPool()
+    monkeypatch.setattr(lavender, "get_pool", lambda env: pool)
+    monkeypatch.setattr(lavender, "READ_CHUNK_SIZE", 101)
+
+    assert list(lavender.stream_spl_tokens(f"{sys.executable} {script}")) == ACCOUNTS
+    assert pool.reports == [0]
+
+
+def test_purge_errors_are_logged(monkeypatch):
+    def failing_purge(operation, env):
+        raise RuntimeError(f"purge of {operation.token} exploded")
+
+    operations = [Operation(kind="purge", token=f"account{i}", mint=f"mint{i}") for i in range(3)]
+    console_file = StringIO()
+
+    monkeypatch.setattr(lavender, "which", lambda cmd: cmd)
+    monkeypatch.setattr(lavender, "configure", lambda *args: None)
+    monkeypatch.setattr(lavender, "stream_spl_tokens", lambda **kwargs: iter(operations))
+    monkeypatch.setattr(lavender, "to_operation", lambda operation: operation)
+    monkeypatch.setattr(lavender, "purge", failing_purge)
+    monkeypatch.setattr(lavender.console, "file", console_file)
+
+    lavender.main(workers=2, env="devnet")
+
+    assert console_file.getvalue().count("An unexpected error occurred during the purge") == 3
+    assert "RuntimeError: purge of account1 exploded" in console_file.getvalue()
@@ -0,0 +1,69 @@
+from struct import pack
+
+from base58 import b58decode, b58encode
+
+from chain.metadata import decode_metadata, get_metadata_address, is_on_curve
+
+UPDATE_AUTHORITY = b58encode(bytes(range(32))).decode()
+MINT = b58encode(bytes(range(32, 64))).decode()
+CREATOR = b58encode(bytes(range(64, 96))).decode()
+COLLECTION = b58encode(bytes(range(96, 128))).decode()
+
+
+def borsh_str(value: str, size: int) -> bytes:
+    """Serializes a string padded with null bytes, as the metadata program does"""
+    data = value.encode().ljust(size, b"\x00")
+    return pack("<I", len(data)) + data
+
+
+def metadata_fixture(collection: bool = True, legacy: bool = False) -> bytes:
+    """Builds the raw data of a metadata account (679 bytes, zero padded)"""
+    data = bytes([4]) + b58decode(UPDATE_AUTHORITY) + b58decode(MINT)
+    data += borsh_str("Herb #1", 32) + borsh_str("HERB", 10) + borsh_str("https://arweave.net/x", 200)
+    data += pack("<H", 500)
+    # One verified creator with 100% share
+    data += b"\x01" + pack("<I", 1) + b58decode(CREATOR) + b"\x01" + bytes([100])
+    # Primary sale happened, mutable
+    data += b"\x01\x01"
+    if legacy:
+        # Legacy accounts end here, without edition nonce, token standard and collection
+        return data
+    # Edition nonce (Some(254)), token standard (None)
+    data += b"\x01\xfe" + b"\x00"
+    data += (b"\x01\x01" + b58decode(COLLECTION)) if collection else b"\x00"
+    return data.ljust(679, b"\x00")
+
+
+def test_decode_metadata_with_collection():
+    metadata = decode_metadata("address", metadata_fixture())
+
+    assert metadata.mint == MINT
+    assert metadata.update_authority == UPDATE_AUTHORITY
+    assert (metadata.name, metadata.symbol, metadata.uri) == ("Herb #1", "HERB", "https://arweave.net/x")
+    assert metadata.seller_fee_basis_points == 500
+    assert [(c.address, c.verified, c.share) for c in metadata.creators] == [(CREATOR, True, 100)]
+    assert metadata.collection is not None
+    assert (metadata.collection.key, metadata.collection.verified) == (COLLECTION, True)
+
+
+def test_decode_metadata_without_collection():
+    assert decode_metadata("address", metadata_fixture(collection=False)).collection is None
+
+
+def test_decode_legacy_metadata():
+    metadata = decode_metadata("address", metadata_fixture(legacy=True))
+
+    assert metadata.name == "Herb #1"
+    assert metadata.collection is None
+
+
+def test_known_metadata_addresses():
+    # USDC and Wrapped SOL metadata accounts
+    assert get_metadata_address("EPjFWdd5AufqSSqeM2qN1xzybapC8G4wEGGkZwyTDt1v") == "5x38Kp4hvdomTCnCrAny4UtMUt5rQBdB6px2K1Ui45Wq"
+    assert get_metadata_address("So11111111111111111111111111111111111111112") == "6dM4TqWyWJsbx7obrdLcviBkTafD5E8av61zfU6jq57X"
+
+
+def test_is_on_curve():
+    # Program ids are regular public keys, PDAs are off the curve by construction
+    assert is_on_curve(b58decode("TokenkegQfeZyiNwAJbNbGKPFXCWuBvf9Ss623VQ5DA"))
+    assert not is_on_curve(b58decode(get_metadata_address(MINT)))
@@ -0,0 +1,124 @@
+import pytest
+
+from chain import GENESIS_HASH, pool
+
+
+def test_request_backs_off_on_429(stubs):
+    stub = stubs(throttled=2)
+    endpoint = pool.configure("localnet", stub.url).endpoints[0]
+
+    assert pool.request("getSlot", [], "localnet") == {"jsonrpc": "2.0", "id": 1, "result": 42}
+    assert stub.requests == ["getSlot"] * 3
+    # Halved twice, then slightly increased by the successful request
+    assert pool.INITIAL_RATE / 4 < endpoint.bucket.rate < pool.INITIAL_RATE / 2
+
+
+def test_request_gives_up_when_always_throttled(stubs):
+    stub = stubs(throttled=100)
+    pool.configure("localnet", stub.url)
+
+    with pytest.raises(RuntimeError):
+        pool.request("getSlot", [], "localnet", retries=2)
+    assert len(stub.requests) == 3
+
+
+def test_weighted_round_robin_skips_unhealthy(stubs):
+    heavy, light, down = stubs(), stubs(), stubs(healthy=False)
+    endpoints_pool = pool.configure("localnet", f"{heavy.url}@3,{light.url},{down.url}@10")
+
+    selected = [endpoints_pool.select().url for _ in range(40)]
+    assert (selected.count(heavy.url), selected.count(light.url), selected.count(down.url)) == (30, 10, 0)
+
+
+def test_run_cli_ignores_429_inside_addresses(stubs):
+    endpoint = pool.configure("localnet", stubs().url).endpoints[0]
+
+    result = pool.run_cli("echo 'Error: account 5H429abc not found'; exit 1", "localnet", retries=3)
+    assert result.returncode == 1
+    assert endpoint.bucket.rate >= pool.INITIAL_RATE
+
+
+def test_run_cli_is_not_retried_by_default(stubs, tmp_path):
+    endpoint = pool.configure("localnet", stubs().url).endpoints[0]
+    attempts = tmp_path / "attempts"
+    cmd = f"echo x >> {attempts}; echo 'HTTP status client error (429 Too Many Requests) for url'; exit 1"
+
+    assert pool.run_cli(cmd, "localnet").returncode == 1
+    assert len(attempts.read_text().splitlines()) == 1
+    assert endpoint.bucket.rate == pool.INITIAL_RATE / 2
+
+    assert pool.run_cli(cmd, "localnet", retries=2).returncode == 1
+    assert len(attempts.read_text().splitlines()) == 4
+
+
+def test_endpoint_going_down_after_configure(stubs, monkeypatch):
+    down, behind, up = stubs(), stubs(), stubs()
+    endpoints_pool = pool.configure("localnet", [down.url, behind.url, up.url])
+    assert all(endpoint.healthy for endpoint in endpoints_pool.endpoints)
+
+    # One endpoint stops answering, the other one falls behind (still answering the requests)
+    down.shutdown()
+    down.server_close()
+    behind.healthy = False
+
+    # The connection errors make the requests fail over to the other endpoints
+    for _ in range(6):
+        assert pool.request("getSlot", [], "localnet")["result"] == 42
+    assert not endpoints_pool.endpoints[0].healthy
+
+    # The endpoints that are still healthy are checked again periodically
+    monkeypatch.setattr(pool, "HEALTH_CHECK_INTERVAL", 0)
+    assert {endpoints_pool.select().url for _ in range(6)} == {up.url}
+    assert [endpoint.healthy for endpoint in endpoints_pool.endpoints] == [False, False, True]
+
+
+def test_run_cli_reports_connection_errors(stubs):
+    endpoint = pool.configure("localnet", stubs().url).endpoints[0]
+    cmd = "echo 'Error: error sending request for url: tcp connect error: Connection refused'; exit 1"
+
+    for _ in range(pool.MAX_FAILURES):
+        assert pool.run_cli(cmd, "localnet").returncode == 1
+    assert endpoint.bucket.rate == pool.INITIAL_RATE
+    assert not endpoint.healthy
+
+
+def test_run_cli_failures_never_increase_the_rate(stubs):
+    endpoint = pool.configure("localnet", stubs().url).endpoints[0]
+
+    assert pool.run_cli("echo 'Error: insufficient funds'; exit 1", "localnet").returncode == 1
+    assert endpoint.bucket.rate == pool.INITIAL_RATE
+    assert pool.run_cli("echo ok", "localnet").returncode == 0
+    assert endpoint.bucket.rate > pool.INITIAL_RATE
+
+
+def test_configure_rejects_endpoints_of_other_clusters(stubs):
+    devnet = stubs(methods={"getGenesisHash": lambda params: GENESIS_HASH["devnet"]})
+    testnet = stubs(methods={"getGenesisHash": lambda params: GENESIS_HASH["testnet"]})
+
+    assert pool.configure("devnet", devnet.url).endpoints[0].verified
+    with pytest.raises(ValueError):
+        pool.configure("devnet", f"{devnet.url},{testnet.url}")
+
+
+def test_unreachable_endpoints_are_verified_once_healthy(stubs, monkeypatch):
+    devnet = stubs(methods={"getGenesisHash": lambda params: GENESIS_HASH["devnet"]})
+    testnet = stubs(healthy=False, methods={"getGenesisHash": lambda params: GENESIS_HASH["testnet"]})
+    endpoints_pool = pool.configure("devnet", [devnet.url, testnet.url])
+    assert [endpoint.verified for endpoint in endpoints_pool.endpoints] == [True, False]
+
+    testnet.healthy = True
+    monkeypatch.setattr(pool, "HEALTH_CHECK_INTERVAL", 0)
+    with pytest.raises(ValueError):
+        endpoints_pool.select()
+
+
+def test_request_does_not_sleep_after_the_last_attempt(stubs, monkeypatch):
+    pool.configure("localnet", stubs(throttled=100).url)
+    sleeps = []
+    # The rate limiter waits are shorter, the backoffs are told apart by their length
+    monkeypatch.setattr(pool, "sleep", sleeps.append)
+    monkeypatch.setattr(pool, "BACKOFF_BASE", 100)
+
+    with pytest.raises(RuntimeError):
+        pool.request("getSlot", [], "localnet", retries=2)
+    assert [seconds for seconds in sleeps if seconds >= 100] == [100, 200]